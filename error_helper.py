@@ -1,7 +1,6 @@
+from dataclasses import dataclass
 from enum import Enum
 from typing import Generic, Optional, TypeVar
-from pydantic import BaseModel
-from pydantic.generics import GenericModel
 
 T = TypeVar("T")
 
@@ -14,16 +13,23 @@ class ErrorCode(str, Enum):
     BUCKET_ACCESS = "BUCKET_ACCESS"
     UNKNOWN = "UNKNOWN"
 
-class Error(BaseModel):
+@dataclass(slots=True, frozen=True)
+class Error:
     code: ErrorCode
     message: str
     retryable: bool = False
 
-class Result(GenericModel, Generic[T]):
+# Not frozen: frozen slotted generics break Result[T](...) on Python < 3.12.
+@dataclass(slots=True)
+class Result(Generic[T]):
     ok: bool
     value: Optional[T] = None
     error: Optional[Error] = None
 
 
 def Err(code: ErrorCode, msg: str) -> Result[T]:
-    return Result[T](ok=False, error=Error(code=code, message=msg))
+    return Result(ok=False, error=Error(code=code, message=msg))
+
+
+def Ok(value: T) -> Result[T]:
+    return Result(ok=True, value=value)
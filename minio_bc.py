@@ -1,13 +1,35 @@
+import asyncio
+import os
+import socket
+import threading
+import time
+import warnings
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
 from datetime import timedelta
-from typing import Iterator, BinaryIO, Optional
+from functools import lru_cache
+from typing import AsyncIterator, Iterator, BinaryIO, Optional
 
+import certifi
+import urllib3
+from urllib3.util.retry import Retry
 from minio import Minio
 from minio.error import S3Error
-from fastapi import Depends
+from minio.helpers import get_part_info, read_part_data
 from pydantic_settings import BaseSettings
 
-from error_helper import Err, ErrorCode
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session
+    from botocore.exceptions import ClientError
+except ImportError:
+    get_session = None
+
+    class ClientError(Exception):
+        pass
+
+from error_helper import Err, ErrorCode, Ok, Result
 
 
 class MinIOSettings(BaseSettings):
@@ -17,17 +39,145 @@ class MinIOSettings(BaseSettings):
     minio_secret_key: str = "password123"
     minio_secure: bool = False
     minio_bucket_name: str = "hello"
+    stream_chunk_size: int = 256 * 1024
+    http_num_pools: int = 16
+    http_pool_maxsize: int = 64
+    http_connect_timeout: float = 5
+    # Server-side copies of large objects can take minutes before the response starts.
+    http_read_timeout: float = 300
+    presign_cache_size: int = 10_000
     
     class Config:
         env_file = ".env"
 
 
+def create_http_client(settings: MinIOSettings) -> urllib3.PoolManager:
+    return urllib3.PoolManager(
+        num_pools=settings.http_num_pools,
+        maxsize=settings.http_pool_maxsize,
+        block=False,
+        timeout=urllib3.Timeout(
+            connect=settings.http_connect_timeout,
+            read=settings.http_read_timeout,
+        ),
+        retries=Retry(
+            total=5,
+            backoff_factor=0.2,
+            status_forcelist=[500, 502, 503, 504],
+        ),
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+        socket_options=[
+            (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+        ],
+    )
+
+
+@lru_cache(maxsize=1024)
+def _normalize_dir(directory: str) -> str:
+    directory = directory.strip("/")
+    return f"{directory}/" if directory else ""
+
+
+MiB = 1024 * 1024
+
+# make_bucket errors that mean the bucket is already there.
+BUCKET_EXISTS_CODES = frozenset({"BucketAlreadyOwnedByYou", "BucketAlreadyExists"})
+
+PRESIGN_CACHE_TTL_FRACTION = 0.1
+PRESIGN_CACHE_MAX_TTL = 300
+
+
+def _choose_part_size(length: Optional[int]) -> int:
+    # Unknown sizes are buffered one part at a time, so keep parts at the 5 MiB minimum.
+    if length is None:
+        return 5 * MiB
+    if length < 100 * MiB:
+        tier = 5 * MiB
+    elif length < 1024 * MiB:
+        tier = 16 * MiB
+    else:
+        tier = 64 * MiB
+    # Never go below the smallest size that fits minio's 10,000-part limit.
+    return max(tier, get_part_info(length, 0)[0])
+
+
+# (endpoint, bucket) pairs already known to exist, shared by the sync and async services.
+_checked_buckets: set = set()
+_checked_buckets_lock = threading.Lock()
+
+
+def _bucket_checked(key: tuple) -> bool:
+    with _checked_buckets_lock:
+        return key in _checked_buckets
+
+
+def _mark_bucket_checked(key: tuple):
+    with _checked_buckets_lock:
+        _checked_buckets.add(key)
+
+
+def ensure_bucket(client: Minio, bucket: str):
+    try:
+        client.make_bucket(bucket)
+    except S3Error as e:
+        if e.code in BUCKET_EXISTS_CODES:
+            return
+        # Credentials without s3:CreateBucket can still use an existing bucket.
+        if e.code == "AccessDenied" and client.bucket_exists(bucket):
+            return
+        raise
+
+
+class ResponseStream(Iterator[bytes]):
+    """Iterate an object body in chunks and release its connection exactly once."""
+
+    def __init__(self, response, chunk_size: int):
+        self._response = response
+        self._chunks = response.stream(chunk_size)
+
+    def __next__(self) -> bytes:
+        if self._response is None:
+            raise StopIteration
+        try:
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        response, self._response = self._response, None
+        if response is not None:
+            response.close()
+            response.release_conn()
+
+    def __del__(self):
+        self.close()
+
+
 class MinIOServiceInterface(ABC):
     
     @abstractmethod
-    def stream_file(self, directory: str, filename: str) -> Iterator[bytes]:
-        """Stream a file from a specific directory."""
+    def open_stream(self, directory: str, filename: str) -> Result[Iterator[bytes]]:
+        """Open a file from a specific directory and return an iterator over its bytes.
+
+        The connection is released once the iterator is exhausted; call its
+        close() if it will not be fully consumed.
+        """
         pass
+
+    def stream_file(self, directory: str, filename: str) -> Iterator[bytes]:
+        """Deprecated: use open_stream, which reports errors as a Result."""
+        warnings.warn(
+            "stream_file is deprecated; use open_stream",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        result = self.open_stream(directory, filename)
+        if not result.ok:
+            raise RuntimeError(result.error.message)
+        return result.value
     
     @abstractmethod
     def delete_file(self, directory: str, filename: str) -> bool:
@@ -42,7 +192,9 @@ class MinIOServiceInterface(ABC):
         filename: str,
         *,
         content_type: Optional[str] = None,
-        part_size: int = 10 * 1024 * 1024, 
+        length: Optional[int] = None,
+        part_size: Optional[int] = None,
+        close_on_finish: bool = True,
     ) -> str:
         pass
     
@@ -55,25 +207,30 @@ class MinIOService(MinIOServiceInterface):
             endpoint=settings.minio_endpoint,
             access_key=settings.minio_access_key,
             secret_key=settings.minio_secret_key,
-            secure=settings.minio_secure
+            secure=settings.minio_secure,
+            http_client=create_http_client(settings),
         )
         self.bucket_name = settings.minio_bucket_name
-        self._ensure_bucket_exists()
+        self._presign_cache: OrderedDict = OrderedDict()
+        self._presign_lock = threading.Lock()
     
-    def _ensure_bucket_exists(self):
+    def _ensure_bucket_exists(self) -> Result[str]:
+        # Run by get_minio_service and before the first upload, not at construction.
+        # Only successes are remembered, so a failed check is retried next time.
+        key = (self.settings.minio_endpoint, self.bucket_name)
+        if _bucket_checked(key):
+            return Ok(self.bucket_name)
         try:
-            if not self.client.bucket_exists(self.bucket_name):
-                self.client.make_bucket(self.bucket_name)
+            ensure_bucket(self.client, self.bucket_name)
         except S3Error as e:
             return Err(ErrorCode.BUCKET_ACCESS, str(e))
         except Exception as e:
-            return Err(ErrorCode.UNKNOWN, e)
+            return Err(ErrorCode.UNKNOWN, str(e))
+        _mark_bucket_checked(key)
+        return Ok(self.bucket_name)
     
     def _build_object_name(self, directory: str, filename: str) -> str:
-        directory = directory.strip("/")
-        if directory:
-            return f"{directory}/{filename}"
-        return filename
+        return _normalize_dir(directory) + filename
 
 
     def upload_stream(
@@ -83,21 +240,26 @@ class MinIOService(MinIOServiceInterface):
         filename: str,
         *,
         content_type: Optional[str] = None,
-        part_size: int = 5 * 1024 * 1024,
+        length: Optional[int] = None,
+        part_size: Optional[int] = None,
+        close_on_finish: bool = True,
     ) -> str:
         try:
             if not filename:
                 raise ValueError("Filename must be provided")
 
             object_name = self._build_object_name(directory, filename)
+            bucket = self._ensure_bucket_exists()
+            if not bucket.ok:
+                return bucket
             ct = content_type or "application/octet-stream"
             self.client.put_object(
                 bucket_name=self.bucket_name,
                 object_name=object_name,
                 data=data,
-                length=-1,
+                length=-1 if length is None else length,
                 content_type=ct,
-                part_size=part_size, 
+                part_size=part_size or _choose_part_size(length),
             )
 
             return object_name
@@ -107,39 +269,24 @@ class MinIOService(MinIOServiceInterface):
         except Exception as e:
             return Err(ErrorCode.UNKNOWN, f"Upload error for '{object_name}': {e}")
         finally:
-            if hasattr(data, 'close') and callable(data.close):
+            if close_on_finish:
                 try:
                     data.close()
                 except Exception:
                     pass
 
     
-    def stream_file(self, directory: str, filename: str) -> Iterator[bytes]:
+    def open_stream(self, directory: str, filename: str) -> Result[Iterator[bytes]]:
+        object_name = self._build_object_name(directory, filename)
         try:
-            object_name = self._build_object_name(directory, filename)
             response = self.client.get_object(self.bucket_name, object_name)
-            
-            try:
-                chunk_size = 8192
-                while True:
-                    chunk = response.read(chunk_size)
-                    if not chunk:
-                        break
-                    yield chunk
-            finally:
-                response.close()
-                response.release_conn()
-                
         except S3Error as e:
             if e.code == "NoSuchKey":
                 return Err(ErrorCode.NOT_FOUND, f"Object not found: '{object_name}'")
             return Err(ErrorCode.STREAM_FAILED, f"Failed to open stream: {e}")
         except Exception as e:
-            return Err(ErrorCode.UNKNOWN, e)
-        finally:
-            if response:
-                response.close()
-                response.release_conn()
+            return Err(ErrorCode.UNKNOWN, str(e))
+        return Ok(ResponseStream(response, self.settings.stream_chunk_size))
 
     
     def delete_file(self, directory: str, filename: str) -> bool:
@@ -164,21 +311,234 @@ class MinIOService(MinIOServiceInterface):
     ) -> str:
         try:
             object_name = self._build_object_name(directory, filename)
-            return self.client.presigned_url(
+            key = (object_name, method, expiry)
+            now = time.monotonic()
+            with self._presign_lock:
+                cached = self._presign_cache.get(key)
+                if cached and cached[1] > now:
+                    self._presign_cache.move_to_end(key)
+                    return cached[0]
+
+            url = self.client.presigned_url(
                 method=method,
                 bucket_name=self.bucket_name,
                 object_name=object_name,
                 expires=expiry
             )
+            # Reuse a URL for at most a tenth of its lifetime (capped at 5 minutes),
+            # so callers always get at least 90% of the expiry they asked for.
+            ttl = min(expiry.total_seconds() * PRESIGN_CACHE_TTL_FRACTION, PRESIGN_CACHE_MAX_TTL)
+            with self._presign_lock:
+                self._presign_cache[key] = (url, now + ttl)
+                self._presign_cache.move_to_end(key)
+                if len(self._presign_cache) > self.settings.presign_cache_size:
+                    self._presign_cache.popitem(last=False)
+            return url
         except S3Error as e:
             return Err(ErrorCode.PRESIGN_FAILED, f"Failed to presign '{object_name}': {e}")
         except Exception as e:
             return Err(ErrorCode.UNKNOWN, e)
 
 
+class AsyncResponseStream(AsyncIterator[bytes]):
+    """Async counterpart of ResponseStream for aiobotocore response bodies."""
+
+    def __init__(self, body, chunk_size: int):
+        self._body = body
+        self._chunks = body.iter_chunks(chunk_size)
+
+    async def __anext__(self) -> bytes:
+        if self._body is None:
+            raise StopAsyncIteration
+        try:
+            return await self._chunks.__anext__()
+        except BaseException:
+            await self.aclose()
+            raise
+
+    async def aclose(self):
+        body, self._body = self._body, None
+        if body is not None:
+            await self._chunks.aclose()
+            body.close()
+
+    def __del__(self):
+        # Best effort when the stream is dropped unconsumed; closing the body is synchronous.
+        if self._body is not None:
+            self._body.close()
+            self._body = None
+
+
+class AsyncMinIOService:
+    """Async counterpart of MinIOService, backed by one shared aiobotocore client."""
+
+    def __init__(self, settings: MinIOSettings):
+        self.settings = settings
+        self.bucket_name = settings.minio_bucket_name
+        self._exit_stack: Optional[AsyncExitStack] = None
+        self.aclient = None
+
+    def _build_object_name(self, directory: str, filename: str) -> str:
+        return _normalize_dir(directory) + filename
+
+    async def start(self):
+        if get_session is None:
+            raise RuntimeError("aiobotocore is required for AsyncMinIOService")
+        scheme = "https" if self.settings.minio_secure else "http"
+        self._exit_stack = AsyncExitStack()
+        self.aclient = await self._exit_stack.enter_async_context(
+            get_session().create_client(
+                "s3",
+                endpoint_url=f"{scheme}://{self.settings.minio_endpoint}",
+                aws_access_key_id=self.settings.minio_access_key,
+                aws_secret_access_key=self.settings.minio_secret_key,
+                region_name="us-east-1",
+                # MinIO serves path-style requests; keep botocore from switching
+                # to virtual-host style (bucket.host) for custom endpoints.
+                config=AioConfig(
+                    s3={"addressing_style": "path"},
+                    max_pool_connections=self.settings.http_pool_maxsize,
+                ),
+            )
+        )
+        try:
+            await self._ensure_bucket_exists()
+        except BaseException:
+            await self.close()
+            raise
+
+    async def _ensure_bucket_exists(self):
+        key = (self.settings.minio_endpoint, self.bucket_name)
+        if _bucket_checked(key):
+            return
+        try:
+            await self.aclient.create_bucket(Bucket=self.bucket_name)
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code == "AccessDenied":
+                # Raises ClientError if the bucket is missing or unreachable.
+                await self.aclient.head_bucket(Bucket=self.bucket_name)
+            elif code not in BUCKET_EXISTS_CODES:
+                raise
+        _mark_bucket_checked(key)
+
+    async def close(self):
+        if self._exit_stack is not None:
+            await self._exit_stack.aclose()
+            self._exit_stack = None
+            self.aclient = None
+
+    async def astream_file(self, directory: str, filename: str) -> Result[AsyncIterator[bytes]]:
+        object_name = self._build_object_name(directory, filename)
+        try:
+            response = await self.aclient.get_object(Bucket=self.bucket_name, Key=object_name)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "NoSuchKey":
+                return Err(ErrorCode.NOT_FOUND, f"Object not found: '{object_name}'")
+            return Err(ErrorCode.STREAM_FAILED, f"Failed to open stream: {e}")
+        except Exception as e:
+            return Err(ErrorCode.UNKNOWN, str(e))
+        return Ok(AsyncResponseStream(response["Body"], self.settings.stream_chunk_size))
+
+    async def aupload_stream(
+        self,
+        data: BinaryIO,
+        directory: str,
+        filename: str,
+        *,
+        content_type: Optional[str] = None,
+        length: Optional[int] = None,
+        part_size: Optional[int] = None,
+        close_on_finish: bool = True,
+    ) -> str:
+        object_name = self._build_object_name(directory, filename or "")
+        try:
+            if not filename:
+                raise ValueError("Filename must be provided")
+
+            ct = content_type or "application/octet-stream"
+            part_size, _ = get_part_info(
+                -1 if length is None else length,
+                part_size or _choose_part_size(length),
+            )
+            # Fill whole parts (a single read may return less) without blocking the loop.
+            chunk = await asyncio.to_thread(read_part_data, data, part_size)
+            if len(chunk) < part_size:
+                await self.aclient.put_object(
+                    Bucket=self.bucket_name, Key=object_name, Body=chunk, ContentType=ct,
+                )
+                return object_name
+
+            upload = await self.aclient.create_multipart_upload(
+                Bucket=self.bucket_name, Key=object_name, ContentType=ct,
+            )
+            upload_id = upload["UploadId"]
+            try:
+                parts = []
+                while chunk:
+                    part = await self.aclient.upload_part(
+                        Bucket=self.bucket_name, Key=object_name, UploadId=upload_id,
+                        PartNumber=len(parts) + 1, Body=chunk,
+                    )
+                    parts.append({"ETag": part["ETag"], "PartNumber": len(parts) + 1})
+                    chunk = await asyncio.to_thread(read_part_data, data, part_size)
+                await self.aclient.complete_multipart_upload(
+                    Bucket=self.bucket_name, Key=object_name, UploadId=upload_id,
+                    MultipartUpload={"Parts": parts},
+                )
+            except BaseException:
+                await self.aclient.abort_multipart_upload(
+                    Bucket=self.bucket_name, Key=object_name, UploadId=upload_id,
+                )
+                raise
+
+            return object_name
+
+        except ClientError as e:
+            return Err(ErrorCode.UPLOAD_FAILED, str(e))
+        except Exception as e:
+            return Err(ErrorCode.UNKNOWN, f"Upload error for '{object_name}': {e}")
+        finally:
+            if close_on_finish:
+                try:
+                    data.close()
+                except Exception:
+                    pass
+
+
+@lru_cache(maxsize=1)
 def get_minio_settings() -> MinIOSettings:
     return MinIOSettings()
 
 
-def get_minio_service(settings: MinIOSettings = Depends(get_minio_settings)) -> MinIOServiceInterface:
-    return MinIOService(settings)
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_minio_service() -> MinIOServiceInterface:
+    # One service (and one connection pool) per process; the Minio client is thread-safe.
+    # Raising keeps a failed bucket check out of the cache, so the next call retries.
+    service = MinIOService(get_minio_settings())
+    result = service._ensure_bucket_exists()
+    if not result.ok:
+        raise RuntimeError(f"MinIO bucket check failed: {result.error.message}")
+    return service
+
+
+@lru_cache(maxsize=1)
+def get_async_minio_service() -> AsyncMinIOService:
+    # Started and closed once by minio_lifespan; use only from async endpoints.
+    return AsyncMinIOService(get_minio_settings())
+
+
+@asynccontextmanager
+async def minio_lifespan(app):
+    # Build the shared service and check its bucket once, before serving requests.
+    # Routes keep getting it from get_minio_service, which returns this cached instance.
+    await asyncio.to_thread(get_minio_service)
+    # aiobotocore is optional; apps that only use the sync service still get a lifespan.
+    service = get_async_minio_service() if get_session is not None else None
+    if service is not None:
+        await service.start()
+    try:
+        yield
+    finally:
+        if service is not None:
+            await service.close()
@@ -1,18 +1,34 @@
-from pydantic_settings import BaseSettings
+import logging
+import logging.handlers
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional
+
 from minio import Minio
-from minio.error import S3Error
-from minio.commonconfig import CopySource
+from minio.commonconfig import ComposeSource, CopySource
+from minio.deleteobjects import DeleteObject
 
+from minio_bc import MinIOSettings, create_http_client, ensure_bucket, get_minio_settings
 
-class MinIOSettings(BaseSettings):
-    minio_endpoint: str = "localhost:9000"
-    minio_access_key: str = "admin"
-    minio_secret_key: str = "password123"
-    minio_secure: bool = False
-    minio_bucket_name: str = "hello"
+logger = logging.getLogger(__name__)
 
-    class Config:
-        env_file = ".env"
+# S3 DeleteObjects accepts at most 1000 keys per request.
+DELETE_BATCH_SIZE = 1000
+PROGRESS_EVERY = 1000
+# Largest object a single CopyObject request can copy.
+MAX_COPY_OBJECT_SIZE = 5 * 1024 ** 3
+# Headers kept when a large object is copied as a multipart compose.
+COPIED_HEADERS = frozenset({
+    "cache-control",
+    "content-disposition",
+    "content-encoding",
+    "content-language",
+    "content-type",
+})
+LIST_WORKERS = 8
+LIST_QUEUE_SIZE = 10_000
 
 
 def init_minio(settings: MinIOSettings) -> Minio:
@@ -21,12 +37,47 @@ def init_minio(settings: MinIOSettings) -> Minio:
         access_key=settings.minio_access_key,
         secret_key=settings.minio_secret_key,
         secure=settings.minio_secure,
+        http_client=create_http_client(settings),
     )
 
 
-def ensure_bucket(client: Minio, bucket: str):
-    if not client.bucket_exists(bucket):
-        client.make_bucket(bucket)
+@lru_cache(maxsize=1)
+def get_minio_client() -> Minio:
+    return init_minio(get_minio_settings())
+
+
+class _LogListener(logging.handlers.QueueListener):
+    """QueueListener that remembers whether it is running."""
+
+    running = False
+
+    def start(self):
+        super().start()
+        self.running = True
+
+    def stop(self):
+        super().stop()
+        self.running = False
+
+
+_log_listener: Optional[_LogListener] = None
+
+
+def configure_logging(level: int = logging.INFO) -> logging.handlers.QueueListener:
+    # Workers only enqueue records; a single listener thread writes them out.
+    # Repeated calls reuse the same handler so lines are not duplicated.
+    global _log_listener
+    logger.setLevel(level)
+    if _log_listener is None:
+        records = queue.SimpleQueue()
+        _log_listener = _LogListener(records, logging.StreamHandler())
+        logger.addHandler(logging.handlers.QueueHandler(records))
+        logger.propagate = False
+        _log_listener.start()
+    elif not _log_listener.running:
+        # Stopped by a previous caller; restart it so queued records are written.
+        _log_listener.start()
+    return _log_listener
 
 
 def normalize_prefix(p: str) -> str:
@@ -35,6 +86,111 @@ def normalize_prefix(p: str) -> str:
     return p if p.endswith("/") else p + "/"
 
 
+def _list(client: Minio, bucket: str, prefix: str, recursive: bool):
+    return client.list_objects(
+        bucket, prefix=prefix, recursive=recursive,
+        fetch_owner=False, use_api_v1=False,
+    )
+
+
+def iter_objects(client: Minio, bucket: str, prefix: str, *, max_workers: int = LIST_WORKERS):
+    """Yield every object under prefix, listing each top-level sub-prefix in parallel."""
+    shards = []
+    for obj in _list(client, bucket, prefix, recursive=False):
+        if obj.is_dir:
+            shards.append(obj.object_name)
+        else:
+            yield obj
+    if not shards:
+        return
+
+    results = queue.Queue(maxsize=LIST_QUEUE_SIZE)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def list_shard(shard):
+        try:
+            for obj in _list(client, bucket, shard, recursive=True):
+                if not put(obj):
+                    return
+            put(done)
+        except Exception as e:
+            put(e)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for shard in shards:
+            executor.submit(list_shard, shard)
+        try:
+            remaining = len(shards)
+            while remaining:
+                item = results.get()
+                if item is done:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            stop.set()
+
+
+def list_existing_keys(client: Minio, bucket: str, prefix: str) -> set:
+    return {o.object_name for o in iter_objects(client, bucket, prefix)}
+
+
+def source_metadata(stat) -> dict:
+    metadata = {}
+    for name, value in (stat.metadata or {}).items():
+        lower = name.lower()
+        if lower in COPIED_HEADERS or lower.startswith("x-amz-meta-"):
+            metadata[name] = value
+    return metadata
+
+
+def _move_one(client: Minio, obj, src_bucket, src_prefix, dest_bucket, dest_prefix, existing):
+    key = obj.object_name
+    tail = key[len(src_prefix):] if src_prefix and key.startswith(src_prefix) else key
+    dest_key = f"{dest_prefix}{tail}"
+
+    if existing is not None and dest_key in existing:
+        logger.debug("SKIP (exists): s3://%s/%s", dest_bucket, dest_key)
+        return "skipped", None
+
+    logger.debug("COPY: %s/%s %s/%s", src_bucket, key, dest_bucket, dest_key)
+    try:
+        if obj.size is not None and obj.size > MAX_COPY_OBJECT_SIZE:
+            # minio falls back to a multipart compose above 5 GiB but starts that upload
+            # without the source's headers; pass them along, since the source is deleted next.
+            stat = client.stat_object(src_bucket, key)
+            client.compose_object(
+                dest_bucket, dest_key, [ComposeSource(src_bucket, key)],
+                metadata=source_metadata(stat),
+            )
+        else:
+            client.copy_object(dest_bucket, dest_key, CopySource(src_bucket, key))
+    except Exception as e:
+        logger.error("ERROR moving %s: %s", key, e)
+        return "error", None
+    return "copied", key
+
+
+def delete_batch(client: Minio, bucket: str, keys: list) -> set:
+    failed = set()
+    for err in client.remove_objects(bucket, (DeleteObject(k) for k in keys)):
+        logger.error("ERROR deleting %s: %s", err.name, err.message)
+        failed.add(err.name)
+    return failed
+
+
 def move_minio_prefix(
     src_bucket: str,
     src_prefix: str,
@@ -42,46 +198,105 @@ def move_minio_prefix(
     dest_prefix: str,
     *,
     overwrite: bool = False,
-):
-    settings = MinIOSettings()
-    client = init_minio(settings)
+    max_workers: int = 16,
+    max_inflight: int = 64,
+    settings: Optional[MinIOSettings] = None,
+) -> dict:
+    # A single Minio client is thread-safe and shared by all workers.
+    client = get_minio_client() if settings is None else init_minio(settings)
 
     src_prefix = normalize_prefix(src_prefix)
     dest_prefix = normalize_prefix(dest_prefix)
 
+    same_bucket = src_bucket == dest_bucket
+    if same_bucket and src_prefix == dest_prefix:
+        logger.info("source and destination are the same: s3://%s/%s", src_bucket, src_prefix)
+        return {"moved": 0, "copied": 0, "skipped": 0, "errors": 0}
+    if same_bucket and dest_prefix.startswith(src_prefix):
+        # The lazy listing would pick up freshly copied objects and move them again.
+        raise ValueError(f"Destination prefix {dest_prefix!r} is inside source prefix {src_prefix!r}")
+
     if not client.bucket_exists(src_bucket):
         raise RuntimeError(f"Source bucket does not exist: {src_bucket}")
-    ensure_bucket(client, dest_bucket)
+    if not same_bucket:
+        ensure_bucket(client, dest_bucket)
 
-    moved = copied = skipped = errors = 0
+    # One paged listing of the destination replaces a HEAD per source object.
+    existing = None if overwrite else list_existing_keys(client, dest_bucket, dest_prefix)
 
-    for obj in client.list_objects(src_bucket, prefix=src_prefix, recursive=True):
-        key = obj.object_name
-        tail = key[len(src_prefix):] if src_prefix and key.startswith(src_prefix) else key
-        dest_key = f"{dest_prefix}{tail}"
+    moved = copied = skipped = errors = processed = 0
+    pending = []
+    lock = threading.Lock()
+    inflight = threading.BoundedSemaphore(max_inflight)
+    # Deletes run on their own thread so they overlap with the next copies.
+    delete_queue = queue.Queue(maxsize=4)
 
-        if not overwrite:
-            try:
-                client.stat_object(dest_bucket, dest_key)
-                print(f"SKIP (exists): s3://{dest_bucket}/{dest_key}")
-                skipped += 1
-                continue
-            except S3Error as e:
-                if e.code not in ("NoSuchKey", "NotFound"):
-                    raise
+    def flush(batch):
+        nonlocal moved, errors
+        try:
+            failed = delete_batch(client, src_bucket, batch)
+        except Exception as e:
+            logger.error("ERROR deleting batch of %d: %s", len(batch), e)
+            failed = set(batch)
+        if logger.isEnabledFor(logging.DEBUG):
+            for key in batch:
+                if key not in failed:
+                    logger.debug("DELETE: %s/%s", src_bucket, key)
+        with lock:
+            moved += len(batch) - len(failed)
+            errors += len(failed)
 
-        print(f"COPY: {src_bucket}/{key} {dest_bucket}/{dest_key}")
+    def deleter():
+        while (batch := delete_queue.get()) is not None:
+            flush(batch)
+
+    def on_done(future):
+        nonlocal copied, skipped, errors, processed, pending
+        inflight.release()
         try:
-            client.copy_object(dest_bucket, dest_key, CopySource(src_bucket, key))
-            copied += 1
-            client.remove_object(src_bucket, key)
-            moved += 1
-            print(f"DELETE: {src_bucket}/{key}")
+            status, key = future.result()
         except Exception as e:
-            errors += 1
-            print(f"ERROR moving {key}: {e}")
-            
-    print(f"moved={moved}, copied={copied}, skipped={skipped}, errors={errors}")
+            logger.error("ERROR moving object: %s", e)
+            status, key = "error", None
+        batch = None
+        with lock:
+            if status == "copied":
+                copied += 1
+                pending.append(key)
+                if len(pending) >= DELETE_BATCH_SIZE:
+                    batch, pending = pending, []
+            elif status == "skipped":
+                skipped += 1
+            else:
+                errors += 1
+            processed += 1
+            if processed % PROGRESS_EVERY == 0:
+                logger.info(
+                    "progress: processed=%d, copied=%d, skipped=%d, errors=%d",
+                    processed, copied, skipped, errors,
+                )
+        if batch:
+            delete_queue.put(batch)
+
+    delete_thread = threading.Thread(target=deleter, name="minio-deleter", daemon=True)
+    delete_thread.start()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for obj in iter_objects(client, src_bucket, src_prefix):
+                inflight.acquire()
+                future = executor.submit(
+                    _move_one, client, obj,
+                    src_bucket, src_prefix, dest_bucket, dest_prefix, existing,
+                )
+                future.add_done_callback(on_done)
+    finally:
+        if pending:
+            delete_queue.put(pending)
+        delete_queue.put(None)
+        delete_thread.join()
+
+    logger.info("moved=%d, copied=%d, skipped=%d, errors=%d", moved, copied, skipped, errors)
+    return {"moved": moved, "copied": copied, "skipped": skipped, "errors": errors}
 
 
 if __name__ == "__main__":
@@ -90,8 +305,12 @@ if __name__ == "__main__":
     dest_bucket = "hello2"
     dest_prefix = "hello8/hello2"
     overwrite = False
-    move_minio_prefix(
-        src_bucket, src_prefix,
-        dest_bucket, dest_prefix,
-        overwrite=overwrite,
-    )
\ No newline at end of file
+    listener = configure_logging()
+    try:
+        move_minio_prefix(
+            src_bucket, src_prefix,
+            dest_bucket, dest_prefix,
+            overwrite=overwrite,
+        )
+    finally:
+        listener.stop()
\ No newline at end of file
@@ -0,0 +1,260 @@
+import asyncio
+import io
+
+import pytest
+from botocore.exceptions import ClientError
+from minio.error import S3Error
+
+import minio_bc
+from error_helper import Err, ErrorCode, Ok
+from minio_bc import _choose_part_size, AsyncMinIOService, MiB, MinIOService, MinIOSettings, ensure_bucket
+
+
+class FakeResponse:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = 0
+        self.released = 0
+
+    def stream(self, chunk_size):
+        yield from self.chunks
+
+    def close(self):
+        self.closed += 1
+
+    def release_conn(self):
+        self.released += 1
+
+
+class FakeClient:
+    def __init__(self, response=None, error=None):
+        self.response = response
+        self.error = error
+
+    def get_object(self, bucket_name, object_name):
+        if self.error:
+            raise self.error
+        return self.response
+
+
+def make_service(client):
+    service = MinIOService(MinIOSettings())
+    service.client = client
+    return service
+
+
+def test_open_stream_missing_object_returns_not_found():
+    error = S3Error(None, "NoSuchKey", "missing", "/hello/d/f", "req", "host")
+    result = make_service(FakeClient(error=error)).open_stream("d", "f")
+
+    assert not result.ok
+    assert result.error.code == ErrorCode.NOT_FOUND
+    assert "d/f" in result.error.message
+
+
+def test_open_stream_releases_connection_once_when_consumed():
+    response = FakeResponse([b"ab", b"cd"])
+    result = make_service(FakeClient(response)).open_stream("d", "f")
+
+    assert result.ok
+    assert b"".join(result.value) == b"abcd"
+    result.value.close()
+    assert (response.closed, response.released) == (1, 1)
+
+
+def test_open_stream_close_without_iterating_releases_connection():
+    response = FakeResponse([b"ab"])
+    result = make_service(FakeClient(response)).open_stream("d", "f")
+
+    result.value.close()
+    assert (response.closed, response.released) == (1, 1)
+
+
+@pytest.mark.parametrize(
+    "length, part_size",
+    [
+        (None, 5 * MiB),
+        (10 * MiB, 5 * MiB),
+        (500 * MiB, 16 * MiB),
+        (5 * 1024 * MiB, 64 * MiB),
+        (48 * 1024 * MiB, 64 * MiB),
+    ],
+)
+def test_choose_part_size_by_length(length, part_size):
+    assert _choose_part_size(length) == part_size
+
+
+def test_choose_part_size_stays_within_part_limit_for_huge_objects():
+    length = 1024 * 1024 * MiB
+    part_size = _choose_part_size(length)
+
+    assert part_size > 64 * MiB
+    assert -(-length // part_size) <= 10_000
+
+
+def test_get_minio_service_does_not_cache_failed_bucket_check(monkeypatch):
+    results = [Err(ErrorCode.BUCKET_ACCESS, "denied"), Ok("hello")]
+    monkeypatch.setattr(MinIOService, "_ensure_bucket_exists", lambda self: results.pop(0))
+    minio_bc.get_minio_service.cache_clear()
+    try:
+        with pytest.raises(RuntimeError, match="denied"):
+            minio_bc.get_minio_service()
+        assert isinstance(minio_bc.get_minio_service(), MinIOService)
+    finally:
+        minio_bc.get_minio_service.cache_clear()
+
+
+class BucketClient:
+    def __init__(self, code, exists):
+        self.code = code
+        self.exists = exists
+
+    def make_bucket(self, bucket):
+        raise S3Error(None, self.code, self.code, f"/{bucket}", "req", "host")
+
+    def bucket_exists(self, bucket):
+        return self.exists
+
+
+def test_ensure_bucket_accepts_existing_bucket_without_create_permission():
+    ensure_bucket(BucketClient("AccessDenied", exists=True), "hello")
+
+
+def test_ensure_bucket_raises_access_denied_for_missing_bucket():
+    with pytest.raises(S3Error):
+        ensure_bucket(BucketClient("AccessDenied", exists=False), "hello")
+
+
+class ShortReadStream(io.RawIOBase):
+    """Returns at most 64 KiB per read, like a socket-backed stream."""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        return self._data.read(min(size, 64 * 1024))
+
+
+class FakeAsyncClient:
+    def __init__(self):
+        self.objects = {}
+        self.parts = []
+
+    async def put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[Key] = Body
+
+    async def create_multipart_upload(self, Bucket, Key, ContentType):
+        return {"UploadId": "upload"}
+
+    async def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.parts.append(Body)
+        return {"ETag": str(PartNumber)}
+
+    async def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.objects[Key] = b"".join(self.parts)
+
+    async def abort_multipart_upload(self, Bucket, Key, UploadId):
+        pass
+
+
+def upload(data):
+    service = AsyncMinIOService(MinIOSettings())
+    service.aclient = FakeAsyncClient()
+    result = asyncio.run(service.aupload_stream(ShortReadStream(data), "d", "f"))
+    return service.aclient, result
+
+
+def test_aupload_stream_fills_parts_across_short_reads():
+    data = bytes(range(256)) * (20 * MiB // 256)
+    client, result = upload(data)
+
+    assert result == "d/f"
+    assert client.objects["d/f"] == data
+    assert [len(p) for p in client.parts] == [5 * MiB] * 4
+
+
+def test_aupload_stream_small_body_with_short_reads_uses_single_put():
+    data = b"x" * (200 * 1024)
+    client, result = upload(data)
+
+    assert result == "d/f"
+    assert client.objects["d/f"] == data
+    assert client.parts == []
+
+
+def test_minio_lifespan_skips_async_service_without_aiobotocore(monkeypatch):
+    built = []
+    monkeypatch.setattr(minio_bc, "get_session", None)
+    monkeypatch.setattr(minio_bc, "get_minio_service", lambda: built.append("sync"))
+    monkeypatch.setattr(minio_bc, "get_async_minio_service", lambda: pytest.fail("async service built"))
+
+    async def run():
+        async with minio_bc.minio_lifespan(None):
+            pass
+
+    asyncio.run(run())
+    assert built == ["sync"]
+
+
+class FakeBody:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = 0
+
+    async def iter_chunks(self, chunk_size):
+        for chunk in self.chunks:
+            yield chunk
+
+    def close(self):
+        self.closed += 1
+
+
+class FakeGetClient:
+    def __init__(self, body=None, code=None):
+        self.body = body
+        self.code = code
+
+    async def get_object(self, Bucket, Key):
+        if self.code:
+            raise ClientError({"Error": {"Code": self.code, "Message": "x"}}, "GetObject")
+        return {"Body": self.body}
+
+
+def astream(client):
+    service = AsyncMinIOService(MinIOSettings())
+    service.aclient = client
+    return service
+
+
+def test_astream_file_missing_object_returns_not_found():
+    result = asyncio.run(astream(FakeGetClient(code="NoSuchKey")).astream_file("d", "f"))
+
+    assert not result.ok
+    assert result.error.code == ErrorCode.NOT_FOUND
+
+
+def test_astream_file_releases_body_once_when_consumed():
+    body = FakeBody([b"ab", b"cd"])
+
+    async def run():
+        result = await astream(FakeGetClient(body)).astream_file("d", "f")
+        data = b"".join([chunk async for chunk in result.value])
+        await result.value.aclose()
+        return data
+
+    assert asyncio.run(run()) == b"abcd"
+    assert body.closed == 1
+
+
+def test_astream_file_aclose_without_iterating_releases_body():
+    body = FakeBody([b"ab"])
+
+    async def run():
+        result = await astream(FakeGetClient(body)).astream_file("d", "f")
+        await result.value.aclose()
+
+    asyncio.run(run())
+    assert body.closed == 1
@@ -0,0 +1,142 @@
+import threading
+import time
+
+import pytest
+from minio.datatypes import Object
+from minio.deleteobjects import DeleteError
+
+import move_minio
+from move_minio import iter_objects, move_minio_prefix
+
+
+class FakeClient:
+    def __init__(self, buckets, fail_copy=(), fail_delete=(), fail_list=()):
+        self.buckets = {name: set(keys) for name, keys in buckets.items()}
+        self.fail_copy = set(fail_copy)
+        self.fail_delete = set(fail_delete)
+        self.fail_list = set(fail_list)
+        self.lock = threading.Lock()
+        self.listed = []
+
+    def list_objects(self, bucket, prefix="", recursive=False, **kwargs):
+        self.listed.append(prefix)
+        if prefix in self.fail_list:
+            raise RuntimeError(f"listing failed: {prefix}")
+        with self.lock:
+            keys = sorted(k for k in self.buckets[bucket] if k.startswith(prefix))
+        if recursive:
+            return iter([Object(bucket, k, size=1) for k in keys])
+        return iter(self._top_level(bucket, prefix, keys))
+
+    def _top_level(self, bucket, prefix, keys):
+        dirs = []
+        for key in keys:
+            head, sep, _ = key[len(prefix):].partition("/")
+            if not sep:
+                yield Object(bucket, key, size=1)
+            elif prefix + head + "/" not in dirs:
+                dirs.append(prefix + head + "/")
+        for name in dirs:
+            yield Object(bucket, name)
+
+    def bucket_exists(self, bucket):
+        return bucket in self.buckets
+
+    def make_bucket(self, bucket):
+        self.buckets.setdefault(bucket, set())
+
+    def copy_object(self, bucket, key, source):
+        if source.object_name in self.fail_copy:
+            raise RuntimeError("copy failed")
+        with self.lock:
+            self.buckets[bucket].add(key)
+
+    def remove_objects(self, bucket, delete_objects):
+        errors = []
+        for obj in delete_objects:
+            if obj.name in self.fail_delete:
+                errors.append(DeleteError("AccessDenied", "denied", obj.name, None))
+            else:
+                with self.lock:
+                    self.buckets[bucket].discard(obj.name)
+        return iter(errors)
+
+
+def source_keys():
+    return ["a/top"] + [f"a/d{j}/f{i}" for j in range(3) for i in range(50)]
+
+
+def test_iter_objects_merges_top_level_and_every_shard():
+    client = FakeClient({"src": source_keys()})
+
+    names = [o.object_name for o in iter_objects(client, "src", "a/")]
+
+    assert sorted(names) == sorted(source_keys())
+    assert len(names) == len(set(names))
+
+
+def test_iter_objects_reraises_a_failing_shard():
+    client = FakeClient({"src": source_keys()}, fail_list={"a/d1/"})
+
+    with pytest.raises(RuntimeError, match="a/d1/"):
+        list(iter_objects(client, "src", "a/"))
+
+
+def test_iter_objects_close_stops_listing_workers(monkeypatch):
+    monkeypatch.setattr(move_minio, "LIST_QUEUE_SIZE", 1)
+    client = FakeClient({"src": source_keys()})
+    objects = iter_objects(client, "src", "a/")
+    next(objects)
+    next(objects)
+
+    started = time.monotonic()
+    objects.close()
+    assert time.monotonic() - started < 5
+
+
+@pytest.fixture
+def use_client(monkeypatch):
+    def install(client):
+        monkeypatch.setattr(move_minio, "get_minio_client", lambda: client)
+        return client
+    return install
+
+
+def test_move_counts_moved_skipped_and_errors(use_client):
+    client = use_client(FakeClient(
+        {"src": source_keys(), "dst": {"b/d0/f0"}},
+        fail_copy={"a/d1/f1"},
+        fail_delete={"a/d2/f2"},
+    ))
+
+    counts = move_minio_prefix("src", "a", "dst", "b")
+
+    assert counts == {"moved": 148, "copied": 149, "skipped": 1, "errors": 2}
+    assert client.buckets["src"] == {"a/d0/f0", "a/d1/f1", "a/d2/f2"}
+    assert "b/d2/f2" in client.buckets["dst"]
+
+
+def test_move_flushes_full_delete_batches(use_client, monkeypatch):
+    monkeypatch.setattr(move_minio, "DELETE_BATCH_SIZE", 7)
+    client = use_client(FakeClient({"src": source_keys()}))
+
+    counts = move_minio_prefix("src", "a", "dst", "b")
+
+    assert counts["moved"] == len(source_keys())
+    assert client.buckets["src"] == set()
+
+
+def test_move_same_bucket_and_prefix_is_a_no_op(use_client):
+    client = use_client(FakeClient({"src": source_keys()}))
+
+    counts = move_minio_prefix("src", "a", "src", "a/")
+
+    assert counts == {"moved": 0, "copied": 0, "skipped": 0, "errors": 0}
+    assert client.listed == []
+
+
+def test_move_rejects_destination_inside_source_prefix(use_client):
+    use_client(FakeClient({"src": source_keys()}))
+
+    with pytest.raises(ValueError):
+        move_minio_prefix("src", "a", "src", "a/b")